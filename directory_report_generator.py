@@ -1,233 +1,355 @@
 import os
 import datetime
 import csv 
-import argparse
+import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Names of files and directories that are never scanned, at any depth. The
+# '.snapshot' directory contains temporary archived copies of the entire
+# directory/volume, and appears inside every directory on some network
+# shares; including it makes the process take several times longer.
+EXCLUDE_NAMES = frozenset({'.snapshot'})
+
+# Return the total size in bytes of all files beneath a directory. Uses
+# os.scandir so that each entry's type and stat information come from the
+# directory listing itself rather than from a separate lookup by path.
+# Subdirectories are kept on an explicit stack rather than visited by
+# recursion, so deep trees cost no extra Python frames and cannot hit the
+# recursion limit. Symlinks are not followed, and entries named in
+# excludeNames are skipped at every level without being opened. Unreadable
+# directories are skipped, as os.walk would have done.
+# By default each file counts the space allocated to it on disk
+# (st_blocks * 512), as du does. With logical=True, or on platforms without
+# st_blocks such as Windows, each file counts its length (st_size) instead.
+def directorySize(path, logical=False, excludeNames=EXCLUDE_NAMES):
+    return scanDirectory(path, logical, excludeNames, False)[0]
+
+# Walk a directory tree as directorySize does, returning its size and, if
+# withMtime is set, the most recent mtime of the directory and all of the
+# directories beneath it (see directoryMtime). Collecting the mtime costs one
+# extra stat per directory, so it is only done when the cache needs it.
+def scanDirectory(path, logical, excludeNames, withMtime):
+    logical = logical or not hasattr(os.stat_result, 'st_blocks')
+    size = 0
+    mtime = None
+    if withMtime:
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            mtime = 0
+    stack = [path]
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.name in excludeNames:
+                    continue
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if withMtime:
+                            mtime = max(mtime, entry.stat(follow_symlinks=False).st_mtime_ns)
+                        stack.append(entry.path)
+                    else:
+                        stat = entry.stat(follow_symlinks=False)
+                        size += stat.st_size if logical else stat.st_blocks * 512
+                except OSError:
+                    continue
+    return size, mtime
+
+# Return the most recent modification time, in nanoseconds, of a directory
+# and all of the directories beneath it. A directory's mtime changes whenever
+# an entry inside it is created, removed or renamed, so this is much cheaper
+# than a full size scan: only directories are stat'ed, never files. It does
+# not notice a file that is rewritten in place without changing its name, nor
+# changes made by tools that restore directory mtimes afterwards, such as
+# rsync -a, cp -p or tar x.
+# If stopAbove is given, the walk stops as soon as any mtime newer than it is
+# found, since the result can then no longer match.
+def directoryMtime(path, excludeNames=EXCLUDE_NAMES, stopAbove=None):
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return 0
+    stack = [path]
+    while stack:
+        if stopAbove is not None and mtime > stopAbove:
+            return mtime
+        try:
+            entries = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False) and entry.name not in excludeNames:
+                        mtime = max(mtime, entry.stat(follow_symlinks=False).st_mtime_ns)
+                        stack.append(entry.path)
+                except OSError:
+                    continue
+    return mtime
+
+# Return the size and mtime of a directory, reusing the size recorded in the
+# previous run when the directory tree's mtime has not changed since then.
+# Cached sizes are only reused if they were measured the same way (on-disk or
+# logical, with the same excluded names) as the current run.
+# Creating, removing or renaming anything gives its parent directory a newer
+# mtime, so the check usually stops early on a changed tree. The full size
+# scan that follows collects the new mtime itself rather than walking the
+# tree a second time.
+def cachedDirectorySize(path, cached, logical=False, excludeNames=EXCLUDE_NAMES):
+    settings = [logical, sorted(excludeNames)]
+    if isinstance(cached, list) and cached[2:] == settings and isinstance(cached[0], int) and isinstance(cached[1], int):
+        mtime = directoryMtime(path, excludeNames, stopAbove=cached[0])
+        if mtime == cached[0]:
+            return [mtime, cached[1]] + settings
+    size, mtime = scanDirectory(path, logical, excludeNames, True)
+    return [mtime, size] + settings
+
+# Format a size in GiB for the text report, switching to TiB for sizes of
+# 1024 GiB or more. Changes in size are formatted the same way, using their
+# magnitude to choose the unit.
+def formatSize(size_gib):
+    if abs(size_gib) >= 1024:
+        return f'{round(size_gib / 1024, 2)} TiB'
+    return f'{size_gib} GiB'
+
+# Return one line of the text report for a folder. currentSize is None if the
+# folder has been removed since the last report, and lastSize is None if
+# there is no previous size to compare against (the first report, or a new
+# folder).
+def formatReportLine(folderName, currentSize, lastSize, newFolder=False):
+    if currentSize is None:
+        return f'{folderName} -- removed ({formatSize(round(0 - lastSize, 2))} change) \n'
+    if lastSize is None:
+        if newFolder:
+            return f'{folderName} -- {formatSize(currentSize)} (new folder) \n'
+        return f'{folderName} -- {formatSize(currentSize)} \n'
+    if currentSize == lastSize:
+        return f'{folderName} -- {formatSize(currentSize)} (no change) \n'
+    growth_gib = round(currentSize - lastSize, 2)
+    if lastSize == 0:
+        return f'{folderName} -- {formatSize(currentSize)} ({formatSize(growth_gib)} change) \n'
+    growthPercent = round((currentSize - lastSize) / lastSize * 100, 2)
+    return f'{folderName} -- {formatSize(currentSize)} ({formatSize(growth_gib)} change, {growthPercent}% growth) \n'
+
+def directoryReport(rootDir, reportDir, jobs=None, useCache=False, logical=False, excludeNames=EXCLUDE_NAMES):
+    # Take the report date once, so that the spreadsheet and text report agree
+    # even if a scan runs past midnight
+    today = datetime.date.today().isoformat()
 
-def directoryReport(rootDir, reportDir):
     # Path to three output reports (one temporary)
-    csvPath1 = reportDir + 'directory_report.csv'
-    csvPath2 = reportDir + 'directory_report_new.csv'
-    txtPath = reportDir + 'directory_report.txt'
+    csvPath1 = os.path.join(reportDir, 'directory_report.csv')
+    csvPath2 = os.path.join(reportDir, 'directory_report_new.csv')
+    txtPath = os.path.join(reportDir, 'directory_report.txt')
+    cachePath = os.path.join(reportDir, 'directory_report_mtime.json')
 
     # Determine whether there is an existing directory_report.csv file at the
     # output path. Create a new temporary report if needed.
-    reportDirContents = os.listdir(reportDir)
-    if 'directory_report.csv' not in reportDirContents:
+    if not os.path.exists(csvPath1):
         with open(csvPath1, 'a', encoding='utf-8', newline='') as blankSpreadsheet:
             blankSpreadsheet.write('DATE\n')
             blankSpreadsheet.write('TOTAL')
             
-    # Create a list of directories (ignoring files) at the user-provided path
-    directories = []
-    topDirs = os.listdir(rootDir)
-    
-    # Remove the '.snapshot' directory from the list to skip it. This directory
-    # contains temporary archived copies of the entire directory/volume and 
-    # makes the process take several times longer if it is included
-    if '.snapshot' in topDirs:
-        topDirs.remove('.snapshot') 
-    for item in topDirs:
-        if os.path.isdir(rootDir + item):
-            directories.append(item)
-
-    # Create a variable for the total size of all directories at the path
-    # Store a list of the directories included in the previous report
+    # Create a list of directories (ignoring files) at the user-provided path,
+    # along with the full path to each one. The DirEntry objects from scandir
+    # already know whether each item is a directory, so no extra lookup by
+    # path is needed. Skip any excluded names, such as '.snapshot'.
+    with os.scandir(rootDir) as topEntries:
+        topDirs = [(entry.name, entry.path) for entry in topEntries if entry.name not in excludeNames and entry.is_dir()]
+    directories = [name for name, path in topDirs]
+
+    # Read the previous report spreadsheet once, keeping its rows in memory and
+    # indexing them by folder name. Store a set of the directories being
+    # scanned now, for fast membership tests.
     # Create a new column header with today's date. Use the header row to 
     # determine the total number of reports included in this spreadsheet
-    total_size = 0
     with open(csvPath1, 'r', encoding='utf-8') as prevSpreadsheet:
-            csvReader = csv.reader(prevSpreadsheet, delimiter=',', quotechar='"')
-            prevList = []
-            for row in csvReader:
-                prevList.append(row[0])
-                if csvReader.line_num == 1:
-                    row.append(datetime.date.today().isoformat())
-                    sheetLength = len(row)
-                    zeroSheetLength = sheetLength - 1
-                    print('This is report number ' + str(zeroSheetLength))
-                    with open(csvPath2, 'a', encoding = 'utf-8', newline='') as newSpreadsheet:
-                        csvWriter = csv.writer(newSpreadsheet, delimiter = ',', quotechar='"')
-                        csvWriter.writerow(row)
+        csvReader = csv.reader(prevSpreadsheet, delimiter=',', quotechar='"')
+        prevRows = list(csvReader)
+    directoriesSet = set(directories)
+
+    # Set the TOTAL row aside before indexing folders, so that a folder named
+    # TOTAL can never share it. The total is always written last, so any
+    # earlier TOTAL row belongs to such a folder. Start a new total row if the
+    # previous spreadsheet has lost it.
+    totalRows = [row for row in prevRows[1:] if row[0] == 'TOTAL']
+    totalRow = totalRows[-1] if totalRows else ['TOTAL']
+    rowsByKey = {row[0]: row for row in prevRows[1:] if row is not totalRow}
+    header = prevRows[0]
+    header.append(today)
+    sheetLength = len(header)
+    zeroSheetLength = sheetLength - 1
+    print('This is report number ' + str(zeroSheetLength))
+
+    # Rows for the new report are collected in memory and written out in one
+    # go once every directory has been processed.
+    newRows = [header]
     
-    # Calculate the size of each top-level directory. Add each directory's size
-    # to the running total size count.
-    # Convert the directory's size to GiB, and if that folder name was in the
-    # previous report, add the latest data to that folder's row.
+    # Calculate the size of each top-level directory. The scans are I/O-bound,
+    # so several directories are read at once on separate threads. By default
+    # up to 32 directories are scanned in parallel; spinning disks may do
+    # better with one or two jobs. Each directory is reported as its scan
+    # finishes, so they may not appear in listing order.
+    if jobs is None:
+        jobs = min(32, len(directories))
+    jobs = max(1, jobs)
+    print('Scanning ' + str(len(directories)) + ' directories')
+
+    # If the cache is enabled, a directory whose tree mtime matches the one
+    # saved in directory_report_mtime.json by the previous run is not scanned
+    # again; its previous size is reused. The cache is replaced atomically
+    # once all directories have been read.
+    # A missing, unreadable or corrupt cache file is treated as empty, so that
+    # every directory is scanned in full.
+    if useCache:
+        cache = {}
+        try:
+            with open(cachePath, 'r', encoding='utf-8') as cacheFile:
+                cache = json.load(cacheFile)
+        except (OSError, ValueError):
+            pass
+        if not isinstance(cache, dict):
+            cache = {}
+    # If the run is interrupted (Ctrl-C) or a scan fails, cancel the scans
+    # still waiting in the queue so that only those already running are left
+    # to finish, rather than letting the pool work through the whole queue.
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        try:
+            futures = {}
+            for folder, path in topDirs:
+                if useCache:
+                    future = executor.submit(cachedDirectorySize, path, cache.get(folder), logical, excludeNames)
+                else:
+                    future = executor.submit(directorySize, path, logical, excludeNames)
+                futures[future] = folder
+            results = {}
+            for future in as_completed(futures):
+                folder = futures[future]
+                results[folder] = future.result()
+                print('Finished reading directory: ' + folder)
+        except BaseException:
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+    if useCache:
+        newCache = {folder: results[folder] for folder in directories}
+        with open(cachePath + '.tmp', 'w', encoding='utf-8') as cacheFile:
+            json.dump(newCache, cacheFile)
+        os.replace(cachePath + '.tmp', cachePath)
+        sizes = {folder: newCache[folder][1] for folder in directories}
+    else:
+        sizes = results
+
+    # Total the sizes of all directories at the path, and convert each
+    # directory's size to GiB in a single pass.
+    total_size = sum(sizes.values())
+    sizesGib = {folder: round(size / 1073741824, 2) for folder, size in sizes.items()}
+
+    # If a folder name was in the previous report, add the latest data to
+    # that folder's row.
     for folder in directories:
-        size = 0    
-        print('Now reading directory: ' + folder)
-        for root, dirs, files in os.walk(rootDir + folder):
-            for file in files:
-                filepath = os.path.join(root, file)
-                size += os.path.getsize(filepath)
-        total_size = total_size + size
-        size_gib = size / 1073741824
-        size_gib = round(size_gib, 2)
-        if folder in prevList:
-            with open(csvPath1, 'r', encoding='utf-8') as prevSpreadsheet:
-                csvReader = csv.reader(prevSpreadsheet, delimiter=',', quotechar='"')
-                for row in csvReader:
-                    if row[0] == folder:
-                        while len(row) < zeroSheetLength:
-                            row.append('')
-                            continue
-                        row.append(size_gib)
-                        newRow = row
+        size_gib = sizesGib[folder]
+        newRow = rowsByKey.get(folder)
+        if newRow is not None:
+            newRow.extend([''] * (zeroSheetLength - len(newRow)))
+            newRow.append(size_gib)
         # If the folder was not in the last report, create a new entry for 
         # it in the new report. Insert blank cells to ensure that the new
         # data is stored in the correct column. 
         else:
-            newRow = []
-            newRow.append(folder)
-            while len(newRow) < zeroSheetLength:
-                newRow.append('')
-                continue
-            newRow.append(size_gib) 
-        with open(csvPath2, 'a', encoding = 'utf-8', newline='') as newSpreadsheet:
-            csvWriter = csv.writer(newSpreadsheet, delimiter = ',', quotechar='"')
-            csvWriter.writerow(newRow)
+            newRow = [folder] + [''] * (zeroSheetLength - 1)
+            newRow.append(size_gib)
+        newRows.append(newRow)
             
-    # Read the previous report spreadsheet one last time to identify folders 
-    # that were present in a previous report but which do not currently exist.
-    # Add a 'TOTAL' column.
-    with open(csvPath1, 'r', encoding='utf-8') as prevSpreadsheet:
-        csvReader = csv.reader(prevSpreadsheet, delimiter=',', quotechar='"')
-        for row in csvReader:
-            if row[0] not in directories:
-                if row[0] != 'DATE':
-                    if row[0] != 'TOTAL':
-                        with open(csvPath2, 'a', encoding='utf-8', newline='') as newSpreadsheet:
-                            csvWriter = csv.writer(newSpreadsheet, delimiter=',', quotechar='"')
-                            csvWriter.writerow(row)
-                    if row[0] == 'TOTAL':
-                        row.append(total_size / 1073741824)
-                        row[-1] = round(row[-1], 2)
-                        with open(csvPath2, 'a', encoding='utf-8', newline='') as newSpreadsheet:
-                            csvWriter = csv.writer(newSpreadsheet, delimiter=',', quotechar='"')
-                            csvWriter.writerow(row)
+    # Keep the rows of folders that were present in a previous report but
+    # which do not currently exist: every previous row whose folder was not
+    # scanned this time. Add a 'TOTAL' column to the total row, which always
+    # comes last.
+    newRows.extend(row for folder, row in rowsByKey.items() if folder not in directoriesSet)
+    totalRow.extend([''] * (zeroSheetLength - len(totalRow)))
+    totalRow.append(round(total_size / 1073741824, 2))
+    newRows.append(totalRow)
+
+    # Write the new report spreadsheet in a single buffered pass, making sure
+    # it has reached the disk before it replaces the previous one
+    with open(csvPath2, 'w', encoding='utf-8', newline='', buffering=1048576) as newSpreadsheet:
+        csvWriter = csv.writer(newSpreadsheet, delimiter=',', quotechar='"')
+        csvWriter.writerows(newRows)
+        newSpreadsheet.flush()
+        os.fsync(newSpreadsheet.fileno())
     
-    # Remove the previous spreadsheet and replace it with the new one                
-    os.remove(csvPath1)
-    os.rename(csvPath2, csvPath1)
+    # Replace the previous spreadsheet with the new one. os.replace swaps the
+    # files in a single atomic step, so an interrupted run leaves either the
+    # old report or the new one, never neither.
+    os.replace(csvPath2, csvPath1)
 
     # Create a report output text file, or add to an existing one at the path.
     # Write the date, the folder name, and size of the folder in GiB or TiB.
     # Determine whether the folder is new in the latest report, was deleted
     # after the previous report, or is unchanged. Wherever possible, provide
-    # the change in absolute and percentage terms.
-    with open(txtPath, 'a+', encoding='utf-8') as output:
-        output.write('\n ----------------------------------- \n\n')            
-        output.write('Report date: ' + str(datetime.date.today().isoformat()) + '\n\n')
-        with open(csvPath1, 'r', encoding='utf-8', newline='') as reportSpreadsheet:
-            csvReader = csv.reader(reportSpreadsheet, delimiter=',', quotechar='"')
-            next(csvReader)
-            for row in csvReader:
-                folderName = row[0]
-                if folderName == 'TOTAL':
-                    output.write('\n')
-                # Identify folders that were not scanned in the last report,
-                # because they have been removed. If these folders were present
-                # in the last scan, note that they have been removed and output
-                # the change in GiB. Folders that have been gone for more than 
-                # one report are not output in the text file, but are kept in 
-                # the spreadsheet. If they are ever re-added to the directory,
-                # the function will add blank column values above (line 110) 
-                # prior to this step.
-                if len(row) < sheetLength:
-                    if len(row) == (sheetLength - 1):
-                        lastSize = float(row[-1])
-                        growth_gib = (0 - lastSize)
-                        growth_gib = round(growth_gib, 2)
-                        growth_tib = growth_gib / 1024
-                        growth_tib = round(growth_tib, 2)
-                        if lastSize < 1024:
-                            output.write(folderName + ' -- removed (' + str(growth_gib) + ' GiB change) \n')
-                        elif lastSize >= 1024:
-                            output.write(folderName + ' -- removed (' + str(growth_tib) + ' TiB change) \n')
-                # For rows that are not blank in the last column, determine
-                # whether this is the first report, whether the folder is new,
-                # or if there has been a change in values between the last two
-                # reports. Produce the appropriate output for each condition.
-                else:
-                    currentSize = float(row[-1])
-                    currentSize_tib = currentSize / 1024
-                    currentSize_tib = round(currentSize_tib, 2)
-                    if currentSize == 0:
-                        if sheetLength == 2:
-                            output.write(folderName + ' -- ' + str(currentSize) + ' GiB \n')
-                        elif row[-2] == '':
-                            output.write(folderName + ' -- ' + str(currentSize) + ' GiB (new folder) \n')
-                        else:
-                            lastSize = float(row[-2])
-                            if currentSize == lastSize:
-                                output.write(folderName + ' -- ' + str(currentSize) + ' GiB (no change) \n')
-                            elif currentSize != lastSize:
-                                growth_gib = (currentSize - lastSize)
-                                growth_gib = round(growth_gib, 2)
-                                if growth_gib < 1024:
-                                    output.write(folderName + ' -- '  + str(currentSize) + ' GiB, (' + str(growth_gib) + ' GiB change) \n')
-                                elif growth_gib >= 1024:
-                                    growth_tib = growth_gib / 1024
-                                    growth_tib = round(growth_tib, 2)
-                                    output.write(folderName + ' -- '  + str(currentSize) + ' TiB, (' + str(growth_tib) + ' GiB change) \n')
-                    elif currentSize > 0:
-                        if row[-2] == '':
-                            if currentSize < 1024:
-                                output.write(folderName + ' -- ' + str(currentSize) + ' GiB (new folder) \n')
-                            elif currentSize >= 1024:
-                                output.write(folderName + ' -- ' + str(currentSize_tib) + ' TiB (new folder) \n')
-                        elif sheetLength == 2:
-                            if currentSize < 1024:
-                                output.write(folderName + ' -- ' + str(currentSize) + ' GiB \n')
-                            elif currentSize >= 1024:
-                                output.write(folderName + ' -- ' + str(currentSize_tib) + ' TiB \n')
-                        elif row[-2] != row[0]:
-                            lastSize = float(row[-2])
-                            growth_gib = (currentSize - lastSize)
-                            growth_gib = round(growth_gib, 2)
-                            growth_tib = growth_gib / 1024
-                            growth_tib = round(growth_tib, 2)
-                            if currentSize == lastSize:
-                                if currentSize <= 1024:
-                                    output.write(folderName + ' -- ' + str(currentSize) + ' GiB (no change) \n')
-                                elif currentSize > 1024:
-                                    output.write(folderName + ' -- ' + str(currentSize_tib) + ' TiB (no change) \n')
-                            elif currentSize != lastSize:
-                                if lastSize != 0:
-                                    growthPercent = (currentSize - lastSize) / lastSize * 100
-                                    growthPercent = round(growthPercent, 2)
-                                    if growth_gib < 1024:
-                                        if currentSize < 1024:
-                                            output.write(folderName + ' -- ' + str(currentSize) + ' GiB (' + str(growth_gib) + ' GiB change, ' + str(growthPercent) + '% growth) \n')
-                                        elif currentSize >= 1024:
-                                            output.write(folderName + ' -- ' + str(currentSize_tib) + ' TiB (' + str(growth_gib) + ' GiB change, ' + str(growthPercent) + '% growth) \n')
-                                    elif growth_gib >= 1024:
-                                        if currentSize < 1024:
-                                            output.write(folderName + ' -- ' + str(currentSize) + ' GiB (' + str(growth_tib) + ' TiB change, ' + str(growthPercent) + '% growth) \n')
-                                        elif currentSize >= 1024:
-                                            output.write(folderName + ' -- ' + str(currentSize_tib) + ' TiB (' + str(growth_tib) + ' TiB change, ' + str(growthPercent) + '% growth) \n')
-                                else:
-                                    if growth_gib < 1024:
-                                        output.write(folderName + ' -- '  + str(currentSize) + ' GiB, (' + str(growth_gib) + ' GiB change) \n')
-                                    elif growth_gib >= 1024:
-                                        growth_tib = growth_gib / 1024
-                                        growth_tib = round(growth_tib, 2)
-                                        output.write(folderName + ' -- '  + str(currentSize) + ' TiB, (' + str(growth_tib) + ' GiB change) \n')
-
-
-        output.write('\n ----------------------------------- \n')    
+    # the change in absolute and percentage terms. The report text is
+    # collected in a list and appended to the file with a single write.
+    parts = [f'\n ----------------------------------- \n\nReport date: {today}\n\n']
+
+    # The positions of the latest and previous report columns are the same
+    # for every row, so work them out once. In the first report there is no
+    # previous column to compare against.
+    firstReport = sheetLength == 2
+    lastCol = sheetLength - 1
+    prevCol = sheetLength - 2
+    with open(csvPath1, 'r', encoding='utf-8', newline='') as reportSpreadsheet:
+        csvReader = csv.reader(reportSpreadsheet, delimiter=',', quotechar='"')
+        next(csvReader)
+        for row in csvReader:
+            folderName = row[0]
+            if folderName == 'TOTAL':
+                parts.append('\n')
+            # Identify folders that were not scanned in the last report,
+            # because they have been removed. If these folders were present
+            # in the last scan, note that they have been removed and output
+            # the change in GiB. Folders that have been gone for more than 
+            # one report are not output in the text file, but are kept in 
+            # the spreadsheet. If they are ever re-added to the directory,
+            # the function will add blank column values above
+            # prior to this step.
+            if len(row) < sheetLength:
+                if len(row) == lastCol:
+                    parts.append(formatReportLine(folderName, None, float(row[prevCol])))
+                continue
+            # For rows that are not blank in the last column, determine
+            # whether this is the first report, whether the folder is new,
+            # or if there has been a change in values between the last two
+            # reports.
+            currentSize = float(row[lastCol])
+            if firstReport:
+                parts.append(formatReportLine(folderName, currentSize, None))
+            elif row[prevCol] == '':
+                parts.append(formatReportLine(folderName, currentSize, None, newFolder=True))
+            else:
+                parts.append(formatReportLine(folderName, currentSize, float(row[prevCol])))
+
+    parts.append('\n ----------------------------------- \n')    
+    with open(txtPath, 'a', encoding='utf-8', buffering=1048576) as output:
+        output.write(''.join(parts))
 
 # Get user input for the path to be scanned and the path to place reports.
-parser = argparse.ArgumentParser(description='Return the total volume of each top-level directory within a given directory. Similar to du -sh in Unix, but with friendlier output. Identify the directory to be scanned and an output directory for generated reports.')
-parser.add_argument('-i', '--input', required=True, help="path to the drive or directory to be scanned", action="store", dest="i")
-parser.add_argument('-o', '--output', required=True, help="Path to a directory where reports will be saved", action="store", dest="o")
-
-args = parser.parse_args()        
-inputDir = args.i
-outputDir = args.o
-
-if not inputDir.endswith('/'):
-    inputDir = inputDir + '/'
-if not outputDir.endswith('/'):
-    outputDir = outputDir + '/'
-directoryReport(inputDir.rstrip(), outputDir.rstrip())
+# The command line is only parsed when the file is run as a script, so that
+# directoryReport can be imported without the cost of building the parser.
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Return the total volume of each top-level directory within a given directory. Similar to du -sh in Unix, but with friendlier output. Identify the directory to be scanned and an output directory for generated reports.')
+    parser.add_argument('-i', '--input', required=True, help="path to the drive or directory to be scanned", action="store", dest="i")
+    parser.add_argument('-o', '--output', required=True, help="Path to a directory where reports will be saved", action="store", dest="o")
+    parser.add_argument('-j', '--jobs', type=int, help="number of top-level directories to scan in parallel (default: up to 32). Use 1 or 2 for spinning disks", action="store", dest="j")
+    parser.add_argument('-c', '--cache', help="reuse the previous size of any directory whose subdirectory modification times are unchanged since the last scan. Much faster when little has changed, but misses files modified in place and changes made by tools that restore directory times (rsync -a, cp -p, tar x). A changed directory costs a partial extra walk on top of its full scan", action="store_true", dest="c")
+    parser.add_argument('-l', '--logical', help="count the length of each file rather than the space it occupies on disk. Sparse and compressed files are counted at their full length", action="store_true", dest="l")
+    parser.add_argument('-x', '--exclude', help="name of a file or directory to skip wherever it appears. May be given more than once. '.snapshot' is always skipped", action="append", default=[], dest="x")
+
+    args = parser.parse_args()
+    inputDir = args.i
+    outputDir = args.o
+
+    directoryReport(inputDir, outputDir, args.j, args.c, args.l, EXCLUDE_NAMES.union(args.x))